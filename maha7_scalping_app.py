@@ -1,12 +1,23 @@
 import streamlit as st
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
 import pandas as pd
 import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
 import yfinance as yf
+import talib
 import plotly.graph_objects as go
 from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor
 import time
 import traceback
 
+# Numba가 설치되어 있으면 프랙탈/신호 계산을 JIT 컴파일된 커널로 수행
+try:
+    from numba import njit
+    NUMBA_AVAILABLE = True
+except ImportError:
+    NUMBA_AVAILABLE = False
+
 # 페이지 설정
 st.set_page_config(
     page_title="마하세븐 스캘핑 전략 분석기",
@@ -99,40 +110,6 @@ ema_short = st.sidebar.number_input("단기 EMA 기간", min_value=5, max_value=
 ema_medium = st.sidebar.number_input("중기 EMA 기간", min_value=20, max_value=100, value=50)
 ema_long = st.sidebar.number_input("장기 EMA 기간", min_value=50, max_value=200, value=100)
 
-# 안전한 불리언 변환 함수
-def safe_bool(value):
-    """판다스 시리즈의 불리언 값을 안전하게 변환"""
-    if isinstance(value, bool):
-        return value
-    elif isinstance(value, (pd.Series, np.ndarray)):
-        # 시리즈가 비어있거나 모든 값이 False인 경우
-        if len(value) == 0 or not value.any():
-            return False
-        # 시리즈에 하나의 값만 있는 경우
-        elif len(value) == 1:
-            return bool(value.iloc[0])
-        # 여러 값이 있는 경우 (이 경우는 오류가 발생해야 함)
-        else:
-            raise ValueError("Multiple boolean values found, cannot convert to single boolean")
-    else:
-        # 기타 타입은 파이썬 기본 bool 함수로 변환
-        return bool(value)
-
-# 안전한 float 변환 함수
-def safe_float(value):
-    """판다스 시리즈의 값을 안전하게 float로 변환"""
-    if isinstance(value, (int, float)):
-        return float(value)
-    elif isinstance(value, pd.Series):
-        if len(value) == 0:
-            return 0.0
-        return float(value.iloc[0])
-    else:
-        try:
-            return float(value)
-        except (TypeError, ValueError):
-            return 0.0
-
 # 윌리엄스 프랙탈 함수 정의
 def calculate_fractals(df):
     """윌리엄스 프랙탈 지표 계산"""
@@ -141,42 +118,29 @@ def calculate_fractals(df):
         if df is None or df.empty or len(df) < 5:
             return df
         
-        # 새 컬럼 초기화
-        df['Fractal_Buy'] = False
-        df['Fractal_Sell'] = False
-        
-        # 매수 프랙탈 (상향 프랙탈)
-        for i in range(2, len(df) - 2):
-            high_i = safe_float(df['High'].iloc[i])
-            high_i_minus_2 = safe_float(df['High'].iloc[i-2])
-            high_i_minus_1 = safe_float(df['High'].iloc[i-1])
-            high_i_plus_1 = safe_float(df['High'].iloc[i+1])
-            high_i_plus_2 = safe_float(df['High'].iloc[i+2])
-            
-            if (high_i_minus_2 < high_i and 
-                high_i_minus_1 < high_i and 
-                high_i > high_i_plus_1 and 
-                high_i > high_i_plus_2):
-                df.loc[df.index[i], 'Fractal_Buy'] = True
-        
-        # 매도 프랙탈 (하향 프랙탈)
-        for i in range(2, len(df) - 2):
-            low_i = safe_float(df['Low'].iloc[i])
-            low_i_minus_2 = safe_float(df['Low'].iloc[i-2])
-            low_i_minus_1 = safe_float(df['Low'].iloc[i-1])
-            low_i_plus_1 = safe_float(df['Low'].iloc[i+1])
-            low_i_plus_2 = safe_float(df['Low'].iloc[i+2])
-            
-            if (low_i_minus_2 > low_i and 
-                low_i_minus_1 > low_i and 
-                low_i < low_i_plus_1 and 
-                low_i < low_i_plus_2):
-                df.loc[df.index[i], 'Fractal_Sell'] = True
+        # 5봉 윈도우 (N-4, 5) 뷰 - 원본 배열과 메모리 공유
+        high_windows = sliding_window_view(df['High'].to_numpy(), 5)
+        low_windows = sliding_window_view(df['Low'].to_numpy(), 5)
+        
+        # 매수 프랙탈 (상향 프랙탈): 가운데 고가가 윈도우 최고가이며 좌우 2개 봉보다 높음
+        # argmax는 동률일 때 앞쪽 위치를 반환하므로 오른쪽 봉과는 엄격한 비교 추가
+        buy = np.zeros(len(df), dtype=bool)
+        buy[2:-2] = ((high_windows.argmax(axis=1) == 2) &
+                     (high_windows[:, 2] > high_windows[:, 3]) &
+                     (high_windows[:, 2] > high_windows[:, 4]))
+        
+        # 매도 프랙탈 (하향 프랙탈): 가운데 저가가 윈도우 최저가이며 좌우 2개 봉보다 낮음
+        sell = np.zeros(len(df), dtype=bool)
+        sell[2:-2] = ((low_windows.argmin(axis=1) == 2) &
+                      (low_windows[:, 2] < low_windows[:, 3]) &
+                      (low_windows[:, 2] < low_windows[:, 4]))
+        
+        df['Fractal_Buy'] = buy
+        df['Fractal_Sell'] = sell
         
         return df
     except Exception as e:
         st.error(f"프랙탈 계산 오류: {e}")
-        st.error(traceback.format_exc())
         # 오류 발생 시 원본 데이터프레임 반환
         if 'Fractal_Buy' not in df.columns:
             df['Fractal_Buy'] = False
@@ -184,6 +148,17 @@ def calculate_fractals(df):
             df['Fractal_Sell'] = False
         return df
 
+# 손절가/목표가 계산 함수
+def calculate_exit_levels(buy, close, ema_medium_values):
+    """매수 신호 위치의 손절가와 목표가 계산 (그 외 위치는 NaN)"""
+    # 손절가 설정 (중기 EMA 바로 아래, 약간의 여유 추가)
+    stop_loss = ema_medium_values * 0.99
+    
+    # 목표가 설정 (손절 대비 1.5배)
+    take_profit = close + (close - stop_loss) * 1.5
+    
+    return np.where(buy, stop_loss, np.nan), np.where(buy, take_profit, np.nan)
+
 # 매수/매도 신호 계산 함수
 def calculate_signals(df, ema_short, ema_medium, ema_long):
     """마하세븐 전략 기반 매수/매도 신호 계산"""
@@ -192,58 +167,40 @@ def calculate_signals(df, ema_short, ema_medium, ema_long):
         if df is None or df.empty or len(df) <= ema_long:
             return df
         
-        # 새 컬럼 초기화
-        df['Buy_Signal'] = False
+        n = len(df)
+        es = df[f'EMA_{ema_short}'].to_numpy()
+        em = df[f'EMA_{ema_medium}'].to_numpy()
+        close = df['Close'].to_numpy()
+        if 'Fractal_Buy' in df.columns:
+            fractal_buy = df['Fractal_Buy'].to_numpy(dtype=bool)
+        else:
+            fractal_buy = np.zeros(n, dtype=bool)
+        
+        # 정배열 확인 (단기 > 중기 > 장기) - 직전 봉 기준
+        if 'EMA_Aligned' in df.columns:
+            is_aligned = df['EMA_Aligned'].to_numpy(dtype=bool)
+        else:
+            el = df[f'EMA_{ema_long}'].to_numpy()
+            is_aligned = (es > em) & (em > el)
+        
+        # 가격이 단기 EMA 아래로 하락했다가 다시 상향 돌파
+        price_below_ema = close[:-1] < es[:-1]
+        price_above_ema = close[1:] > es[1:]
+        
+        # 모든 조건 충족 시 매수 신호 (매수 프랙탈 발생 포함)
+        buy = np.zeros(n, dtype=bool)
+        buy[1:] = is_aligned[:-1] & price_below_ema & price_above_ema & fractal_buy[1:]
+        
+        stop_loss, take_profit = calculate_exit_levels(buy, close, em)
+        
+        df['Buy_Signal'] = buy
         df['Sell_Signal'] = False
-        df['Stop_Loss'] = np.nan
-        df['Take_Profit'] = np.nan
-        
-        # 매수 신호 계산
-        for i in range(1, len(df)):
-            try:
-                # 정배열 확인 (단기 > 중기 > 장기)
-                ema_short_val = safe_float(df[f'EMA_{ema_short}'].iloc[i-1])
-                ema_medium_val = safe_float(df[f'EMA_{ema_medium}'].iloc[i-1])
-                ema_long_val = safe_float(df[f'EMA_{ema_long}'].iloc[i-1])
-                
-                is_aligned = (ema_short_val > ema_medium_val) and (ema_medium_val > ema_long_val)
-                
-                # 가격이 단기 EMA 아래로 하락했다가 다시 상향 돌파
-                price_prev = safe_float(df['Close'].iloc[i-1])
-                price_curr = safe_float(df['Close'].iloc[i])
-                ema_short_prev = safe_float(df[f'EMA_{ema_short}'].iloc[i-1])
-                ema_short_curr = safe_float(df[f'EMA_{ema_short}'].iloc[i])
-                
-                price_below_ema = price_prev < ema_short_prev
-                price_above_ema = price_curr > ema_short_curr
-                
-                # 매수 프랙탈 발생 - 안전하게 불리언 값으로 변환
-                fractal_buy = False
-                if i < len(df) and 'Fractal_Buy' in df.columns:
-                    fractal_buy = bool(df['Fractal_Buy'].iloc[i])
-                
-                # 모든 조건 충족 시 매수 신호
-                if is_aligned and price_below_ema and price_above_ema and fractal_buy:
-                    df.loc[df.index[i], 'Buy_Signal'] = True
-                    
-                    # 손절가 설정 (중기 EMA 바로 아래)
-                    stop_loss = safe_float(df[f'EMA_{ema_medium}'].iloc[i]) * 0.99  # 약간의 여유 추가
-                    
-                    # 목표가 설정 (손절 대비 1.5배)
-                    entry_price = safe_float(df['Close'].iloc[i])
-                    risk = entry_price - stop_loss
-                    take_profit = entry_price + (risk * 1.5)
-                    
-                    df.loc[df.index[i], 'Stop_Loss'] = stop_loss
-                    df.loc[df.index[i], 'Take_Profit'] = take_profit
-            except Exception as e:
-                st.error(f"신호 계산 중 오류 (인덱스 {i}): {e}")
-                continue
+        df['Stop_Loss'] = stop_loss
+        df['Take_Profit'] = take_profit
         
         return df
     except Exception as e:
         st.error(f"신호 계산 오류: {e}")
-        st.error(traceback.format_exc())
         # 오류 발생 시 기본 컬럼 추가하고 원본 데이터프레임 반환
         if 'Buy_Signal' not in df.columns:
             df['Buy_Signal'] = False
@@ -255,50 +212,254 @@ def calculate_signals(df, ema_short, ema_medium, ema_long):
             df['Take_Profit'] = np.nan
         return df
 
-# 메인 함수 - 데이터 가져오기 및 분석
-def analyze_stock(ticker, start_date, end_date, ema_short, ema_medium, ema_long):
-    """주식 데이터 가져오기 및 분석"""
-    if not ticker:
+# 프랙탈 + 매수 신호 통합 계산 커널 (Numba)
+if NUMBA_AVAILABLE:
+    @njit(cache=True, nogil=True)
+    def _compute_signals(high, low, close, es, aligned):
+        """한 번의 순회로 윌리엄스 프랙탈과 마하세븐 매수 신호 계산"""
+        n = len(close)
+        fractal_buy = np.zeros(n, dtype=np.bool_)
+        fractal_sell = np.zeros(n, dtype=np.bool_)
+        buy_signal = np.zeros(n, dtype=np.bool_)
+        
+        for i in range(2, n - 2):
+            # 매수 프랙탈 (상향 프랙탈)
+            h = high[i]
+            if high[i-2] < h and high[i-1] < h and h > high[i+1] and h > high[i+2]:
+                fractal_buy[i] = True
+            
+            # 매도 프랙탈 (하향 프랙탈)
+            l = low[i]
+            if low[i-2] > l and low[i-1] > l and l < low[i+1] and l < low[i+2]:
+                fractal_sell[i] = True
+            
+            # 직전 봉 정배열 + 단기 EMA 상향 돌파 + 매수 프랙탈
+            if (fractal_buy[i] and aligned[i-1] and
+                    close[i-1] < es[i-1] and close[i] > es[i]):
+                buy_signal[i] = True
+        
+        return fractal_buy, fractal_sell, buy_signal
+
+# 주가 데이터 다운로드 함수 (1시간 캐시)
+@st.cache_data(ttl=3600, show_spinner=False)
+def _fetch_ohlcv(ticker: str, start: str, end: str) -> pd.DataFrame:
+    """Yahoo Finance에서 OHLCV 데이터 다운로드"""
+    return yf.download(ticker, start=start, end=end)
+
+# 여러 종목 데이터 일괄 다운로드 함수 (1시간 캐시)
+@st.cache_data(ttl=3600, show_spinner=False)
+def _fetch_ohlcv_batch(tickers: tuple, start: str, end: str) -> dict:
+    """여러 종목의 OHLCV 데이터를 한 번에 다운로드한 뒤 종목별로 분리"""
+    data = yf.download(" ".join(tickers), start=start, end=end, group_by='ticker', threads=True)
+    
+    frames = {}
+    for ticker in tickers:
+        if (data is None or data.empty or
+                not isinstance(data.columns, pd.MultiIndex) or
+                ticker not in data.columns.get_level_values(0)):
+            frames[ticker] = None
+            continue
+        # 시장별 휴장일이 달라 생기는 빈 행 제거
+        frames[ticker] = data[ticker].dropna(how='all')
+    return frames
+
+# 다운로드한 데이터 정리 함수
+def _prepare_ohlcv(ticker, data):
+    """다운로드한 OHLCV 데이터의 컬럼 정리 및 유효성 검사"""
+    if data is None or data.empty:
+        st.warning(f"{ticker}에 대한 데이터를 가져올 수 없습니다. 올바른 티커 심볼인지 확인하세요.")
         return None
     
-    try:
-        # 데이터 가져오기
-        data = yf.download(ticker, start=start_date, end=end_date)
-        
-        if data is None or data.empty:
-            st.warning(f"{ticker}에 대한 데이터를 가져올 수 없습니다. 올바른 티커 심볼인지 확인하세요.")
-            return None
-        
-        # 데이터 유효성 검사
-        required_columns = ['Open', 'High', 'Low', 'Close', 'Volume']
-        for col in required_columns:
-            if col not in data.columns:
-                st.warning(f"필수 컬럼 '{col}'이 데이터에 없습니다.")
-                return None
-        
-        # EMA 계산
-        try:
-            data[f'EMA_{ema_short}'] = data['Close'].ewm(span=ema_short, adjust=False).mean()
-            data[f'EMA_{ema_medium}'] = data['Close'].ewm(span=ema_medium, adjust=False).mean()
-            data[f'EMA_{ema_long}'] = data['Close'].ewm(span=ema_long, adjust=False).mean()
-        except Exception as e:
-            st.error(f"EMA 계산 오류: {e}")
+    # 단일 종목도 MultiIndex 컬럼으로 반환되는 경우 1단계 컬럼으로 정리
+    if isinstance(data.columns, pd.MultiIndex):
+        data.columns = data.columns.get_level_values(0)
+    
+    # 데이터 유효성 검사
+    required_columns = ['Open', 'High', 'Low', 'Close', 'Volume']
+    for col in required_columns:
+        if col not in data.columns:
+            st.warning(f"필수 컬럼 '{col}'이 데이터에 없습니다.")
             return None
-        
+    
+    # 가격 데이터를 float32로 변환해 이후 계산의 메모리 사용량 절감 (거래량은 정수 유지)
+    price_columns = ['Open', 'High', 'Low', 'Close']
+    data[price_columns] = data[price_columns].astype(np.float32)
+    return data
+
+# EMA 계산 함수
+def _calculate_emas(data, periods):
+    """기간별 EMA를 float64 배열로 계산"""
+    # TA-Lib은 float64 입력만 지원하므로 계산 시에만 변환
+    close = data['Close'].to_numpy(dtype=np.float64)
+    # TA-Lib은 초기 (period - 1)개 구간을 NaN으로 반환
+    return {period: talib.EMA(close, timeperiod=int(period)) for period in periods}
+
+# EMA 증분 업데이트 함수
+def _extend_ema(last_ema, values, period):
+    """마지막 EMA 값에서 시작해 새 봉에 대해서만 EMA 점화식 적용"""
+    alpha = 2.0 / (period + 1)
+    ema = np.empty(len(values), dtype=np.float64)
+    prev = last_ema
+    for k, value in enumerate(values):
+        prev = alpha * value + (1 - alpha) * prev
+        ema[k] = prev
+    return ema
+
+# 프랙탈 및 매수/매도 신호 계산 함수
+def _add_signals(data, emas, ema_short, ema_medium, ema_long):
+    """EMA 컬럼을 추가하고 윌리엄스 프랙탈, 매수/매도 신호 계산"""
+    for period, values in emas.items():
+        data[f'EMA_{period}'] = values.astype(np.float32)
+    
+    # 정배열 여부 (단기 > 중기 > 장기) - 신호 계산 및 전략 변형에서 재사용
+    es = data[f'EMA_{ema_short}'].to_numpy()
+    em = data[f'EMA_{ema_medium}'].to_numpy()
+    el = data[f'EMA_{ema_long}'].to_numpy()
+    data['EMA_Aligned'] = (es > em) & (em > el)
+    
+    if NUMBA_AVAILABLE and len(data) > ema_long:
+        # 윌리엄스 프랙탈 및 매수/매도 신호 계산 (단일 패스)
+        close = data['Close'].to_numpy()
+        fractal_buy, fractal_sell, buy_signal = _compute_signals(
+            data['High'].to_numpy(),
+            data['Low'].to_numpy(),
+            close,
+            es,
+            data['EMA_Aligned'].to_numpy(),
+        )
+        stop_loss, take_profit = calculate_exit_levels(buy_signal, close, em)
+        data['Fractal_Buy'] = fractal_buy
+        data['Fractal_Sell'] = fractal_sell
+        data['Buy_Signal'] = buy_signal
+        data['Sell_Signal'] = False
+        data['Stop_Loss'] = stop_loss
+        data['Take_Profit'] = take_profit
+    else:
         # 윌리엄스 프랙탈 계산
         data = calculate_fractals(data)
         
         # 매수/매도 신호 계산
         data = calculate_signals(data, ema_short, ema_medium, ema_long)
-        
-        return data
+    
+    return data
+
+# 다운로드한 데이터 분석 함수
+def _analyze_ohlcv(ticker, data, ema_short, ema_medium, ema_long):
+    """OHLCV 데이터에 EMA, 윌리엄스 프랙탈, 매수/매도 신호 추가"""
+    data = _prepare_ohlcv(ticker, data)
+    if data is None:
+        return None
+    
+    # EMA 계산
+    try:
+        emas = _calculate_emas(data, (ema_short, ema_medium, ema_long))
+    except Exception as e:
+        st.error(f"EMA 계산 오류: {e}")
+        return None
+    
+    return _add_signals(data, emas, ema_short, ema_medium, ema_long)
+
+# 단일 종목 분석 함수 (EMA 증분 업데이트)
+def _analyze_ticker(ticker, start, end, ema_short, ema_medium, ema_long):
+    """단일 종목 데이터 가져오기 및 분석
+    
+    같은 종목/시작일/EMA 기간의 이전 결과가 세션에 있으면 마지막 봉 이후의
+    새 봉만 다운로드하고, EMA는 저장된 마지막 값에서 이어서 계산
+    """
+    periods = (ema_short, ema_medium, ema_long)
+    key = (ticker, start, periods)
+    ema_cache = st.session_state.setdefault('ema_cache', {})
+    state = ema_cache.get(key)
+    
+    # 종료일이 앞당겨졌거나 EMA 준비 구간이 끝나지 않은 경우 전체 재계산
+    if state is not None and (end < state['end'] or
+                              any(np.isnan(state['emas'][p][-1]) for p in periods)):
+        state = None
+    
+    if state is None:
+        data = _prepare_ohlcv(ticker, _fetch_ohlcv(ticker, start, end))
+        if data is None:
+            return None
+        try:
+            emas = _calculate_emas(data, periods)
+        except Exception as e:
+            st.error(f"EMA 계산 오류: {e}")
+            return None
+    else:
+        data = state['data']
+        emas = state['emas']
+        
+        # 마지막 봉 다음 날부터의 새 봉만 다운로드
+        next_day = (state['last_timestamp'] + timedelta(days=1)).date().isoformat()
+        if end > state['end'] and next_day < end:
+            new_bars = _fetch_ohlcv(ticker, next_day, end)
+            if new_bars is not None and not new_bars.empty:
+                new_bars = _prepare_ohlcv(ticker, new_bars)
+            if new_bars is not None and not new_bars.empty:
+                new_bars = new_bars[new_bars.index > state['last_timestamp']]
+                new_close = new_bars['Close'].to_numpy(dtype=np.float64)
+                emas = {
+                    p: np.concatenate([emas[p], _extend_ema(emas[p][-1], new_close, p)])
+                    for p in periods
+                }
+                data = pd.concat([data, new_bars])
+    
+    ema_cache[key] = {
+        'end': end,
+        'last_timestamp': data.index[-1],
+        'data': data,
+        'emas': emas,
+    }
+    
+    return _add_signals(data.copy(), emas, ema_short, ema_medium, ema_long)
+
+# 메인 함수 - 데이터 가져오기 및 분석
+def analyze_stock(ticker, start_date, end_date, ema_short, ema_medium, ema_long):
+    """주식 데이터 가져오기 및 분석
+    
+    티커 목록을 넘기면 한 번의 요청으로 모두 다운로드하고
+    {티커: 분석 결과} 딕셔너리를 반환
+    """
+    if not ticker:
+        return None
+    
+    try:
+        start, end = start_date.isoformat(), end_date.isoformat()
+        
+        # 단일 종목
+        if isinstance(ticker, str):
+            return _analyze_ticker(ticker, start, end, ema_short, ema_medium, ema_long)
+        
+        # 여러 종목 - 중복 제거 후 일괄 다운로드
+        tickers = tuple(dict.fromkeys(ticker))
+        if not tickers:
+            return {}
+        frames = _fetch_ohlcv_batch(tickers, start, end)
+        
+        # 종목별 분석은 서로 독립적이므로 스레드 풀에서 병렬 수행
+        # (작업 스레드에서도 st.warning 등을 쓸 수 있도록 실행 컨텍스트 전달)
+        with ThreadPoolExecutor(max_workers=min(8, len(tickers)),
+                                initializer=add_script_run_ctx,
+                                initargs=(None, get_script_run_ctx())) as executor:
+            results = executor.map(
+                lambda t: _analyze_ohlcv(t, frames.get(t), ema_short, ema_medium, ema_long),
+                tickers
+            )
+            return dict(zip(tickers, results))
     
     except Exception as e:
         st.error(f"데이터 가져오기 오류: {e}")
         st.error(traceback.format_exc())
         return None
 
+# 차트 캐시 키 함수 - 데이터프레임 전체 대신 크기, 기간, 마지막 종가로 식별
+def _chart_data_key(data):
+    if data.empty:
+        return (0,)
+    return (len(data), data.index[0], data.index[-1], float(data['Close'].iloc[-1]))
+
 # 차트 생성 함수
+@st.cache_data(show_spinner=False, hash_funcs={pd.DataFrame: _chart_data_key})
 def create_chart(data, ticker, ema_short, ema_medium, ema_long):
     """Plotly를 사용한 차트 생성"""
     try:
@@ -346,13 +507,16 @@ def create_chart(data, ticker, ema_short, ema_medium, ema_long):
                 line=dict(color='purple', width=1)
             ))
         
+        lows = data['Low'].to_numpy()
+        highs = data['High'].to_numpy()
+        
         # 매수 신호 표시
         if 'Buy_Signal' in data.columns:
-            buy_signals = data.loc[data['Buy_Signal'] == True]
-            if not buy_signals.empty:
+            buy_mask = data['Buy_Signal'].to_numpy(dtype=bool)
+            if buy_mask.any():
                 fig.add_trace(go.Scatter(
-                    x=buy_signals.index,
-                    y=buy_signals['Low'] * 0.99,  # 약간 아래에 표시
+                    x=data.index[buy_mask],
+                    y=lows[buy_mask] * 0.99,  # 약간 아래에 표시
                     mode='markers',
                     name='매수 신호',
                     marker=dict(
@@ -364,11 +528,11 @@ def create_chart(data, ticker, ema_short, ema_medium, ema_long):
         
         # 매수 프랙탈 표시
         if 'Fractal_Buy' in data.columns:
-            buy_fractals = data.loc[data['Fractal_Buy'] == True]
-            if not buy_fractals.empty:
+            buy_fractal_mask = data['Fractal_Buy'].to_numpy(dtype=bool)
+            if buy_fractal_mask.any():
                 fig.add_trace(go.Scatter(
-                    x=buy_fractals.index,
-                    y=buy_fractals['High'] * 1.01,  # 약간 위에 표시
+                    x=data.index[buy_fractal_mask],
+                    y=highs[buy_fractal_mask] * 1.01,  # 약간 위에 표시
                     mode='markers',
                     name='매수 프랙탈',
                     marker=dict(
@@ -380,11 +544,11 @@ def create_chart(data, ticker, ema_short, ema_medium, ema_long):
         
         # 매도 프랙탈 표시
         if 'Fractal_Sell' in data.columns:
-            sell_fractals = data.loc[data['Fractal_Sell'] == True]
-            if not sell_fractals.empty:
+            sell_fractal_mask = data['Fractal_Sell'].to_numpy(dtype=bool)
+            if sell_fractal_mask.any():
                 fig.add_trace(go.Scatter(
-                    x=sell_fractals.index,
-                    y=sell_fractals['Low'] * 0.99,  # 약간 아래에 표시
+                    x=data.index[sell_fractal_mask],
+                    y=lows[sell_fractal_mask] * 0.99,  # 약간 아래에 표시
                     mode='markers',
                     name='매도 프랙탈',
                     marker=dict(
@@ -431,57 +595,114 @@ def calculate_backtest_results(data):
             'total_return': 0
         }
         
-        # 불리언 인덱싱 대신 명시적 비교 사용
-        buy_signals = data.loc[data['Buy_Signal'] == True].copy()
-        
-        if buy_signals.empty:
+        # 매수 신호가 없으면 이후 계산 없이 기본 결과 반환
+        signal_positions = np.flatnonzero(data['Buy_Signal'].to_numpy(dtype=bool))
+        if len(signal_positions) == 0:
             return results
         
-        results['total_signals'] = len(buy_signals)
+        results['total_signals'] = len(signal_positions)
+        
+        lows = data['Low'].to_numpy()
+        highs = data['High'].to_numpy()
+        closes = data['Close'].to_numpy()
+        stop_losses = data['Stop_Loss'].to_numpy()
+        take_profits = data['Take_Profit'].to_numpy()
+        
+        # 신호별 청산 결과 (1: 목표가 도달, -1: 손절, 0: 미청산)와 수익률(%)
+        outcomes = np.zeros(len(signal_positions), dtype=np.int8)
+        returns = np.zeros(len(signal_positions), dtype=np.float64)
         
         # 각 매수 신호에 대해 결과 계산
-        for i, signal in buy_signals.iterrows():
-            try:
-                entry_price = safe_float(signal['Close'])
-                
-                # NaN 값 확인
-                if pd.isna(signal['Stop_Loss']) or pd.isna(signal['Take_Profit']):
-                    continue
-                
-                stop_loss = safe_float(signal['Stop_Loss'])
-                take_profit = safe_float(signal['Take_Profit'])
-                
-                # 해당 신호 이후의 데이터
-                future_data = data.loc[i:].iloc[1:]
-                
-                if future_data.empty:
-                    continue
-                
-                # 손절 또는 목표가 도달 여부 확인
-                reached_stop_loss = False
-                reached_take_profit = False
-                exit_price = entry_price
-                
-                for j, future_bar in future_data.iterrows():
-                    # 손절가에 도달
-                    if future_bar['Low'] <= stop_loss:
-                        reached_stop_loss = True
-                        exit_price = stop_loss
-                        break
-                    
-                    # 목표가에 도달
-                    if future_bar['High'] >= take_profit:
-                        reached_take_profit = True
-                        exit_price = take_profit
-                        break
-                
-                # 승리/패배 기록
-                if reached_take_profit:
-                    results['wins'] += 1
-                    profit_pct = (exit_price - entry_price) / entry_price * 100
-                    results['avg_profit'] += profit_pct
-                elif reached_stop_loss:
-                    results['losses'] += 1
-                    loss_pct = (exit_price - entry_price) / entry_price * 100
-                    results['avg_l
-(Content truncated due to size limit. Use line ranges to read in chunks)
\ No newline at end of file
+        for k, pos in enumerate(signal_positions):
+            entry_price = float(closes[pos])
+            stop_loss = float(stop_losses[pos])
+            take_profit = float(take_profits[pos])
+            
+            # NaN 값 확인
+            if np.isnan(stop_loss) or np.isnan(take_profit):
+                continue
+            
+            # 해당 신호 이후의 데이터
+            future_lows = lows[pos + 1:]
+            future_highs = highs[pos + 1:]
+            
+            if len(future_lows) == 0:
+                continue
+            
+            # 손절 또는 목표가에 처음 도달한 봉의 위치 (같은 봉에서는 손절 우선)
+            hit_stop_loss = future_lows <= stop_loss
+            hit_take_profit = future_highs >= take_profit
+            first_stop_loss = hit_stop_loss.argmax() if hit_stop_loss.any() else np.inf
+            first_take_profit = hit_take_profit.argmax() if hit_take_profit.any() else np.inf
+            
+            # 승리/패배 기록
+            if first_take_profit < first_stop_loss:
+                outcomes[k] = 1
+                returns[k] = (take_profit - entry_price) / entry_price * 100
+            elif first_stop_loss < np.inf:
+                outcomes[k] = -1
+                returns[k] = (stop_loss - entry_price) / entry_price * 100
+        
+        # 통계 계산
+        wins = outcomes == 1
+        losses = outcomes == -1
+        results['wins'] = int(wins.sum())
+        results['losses'] = int(losses.sum())
+        total_profit = float(returns[wins].sum())
+        total_loss = float(np.abs(returns[losses]).sum())
+        
+        closed_trades = results['wins'] + results['losses']
+        if closed_trades > 0:
+            results['win_rate'] = results['wins'] / closed_trades * 100
+        if results['wins'] > 0:
+            results['avg_profit'] = float(returns[wins].mean())
+        if results['losses'] > 0:
+            results['avg_loss'] = float(returns[losses].mean())
+        if total_loss > 0:
+            results['profit_factor'] = total_profit / total_loss
+        results['total_return'] = total_profit - total_loss
+        
+        return results
+    except Exception as e:
+        st.error(f"백테스팅 계산 오류: {e}")
+        st.error(traceback.format_exc())
+        return None
+
+# 메인 화면 - 분석 실행 및 결과 표시
+if ticker:
+    with st.spinner(f"{ticker} 데이터를 분석하는 중..."):
+        data = analyze_stock(ticker, start_date, end_date, ema_short, ema_medium, ema_long)
+    
+    if data is not None:
+        # 차트 표시
+        fig = create_chart(data, ticker, ema_short, ema_medium, ema_long)
+        if fig is not None:
+            st.plotly_chart(fig, use_container_width=True)
+        
+        # 백테스팅 결과 표시
+        st.header("백테스팅 결과")
+        results = calculate_backtest_results(data)
+        
+        if results is not None:
+            col1, col2, col3, col4 = st.columns(4)
+            col1.metric("총 매수 신호", results['total_signals'])
+            col2.metric("승률", f"{results['win_rate']:.2f}%")
+            col3.metric("손익비", f"{results['profit_factor']:.2f}")
+            col4.metric("총 수익률", f"{results['total_return']:.2f}%")
+            
+            col5, col6, col7, col8 = st.columns(4)
+            col5.metric("승리", results['wins'])
+            col6.metric("패배", results['losses'])
+            col7.metric("평균 수익", f"{results['avg_profit']:.2f}%")
+            col8.metric("평균 손실", f"{results['avg_loss']:.2f}%")
+        
+        # 매수 신호 목록 표시
+        if 'Buy_Signal' in data.columns:
+            st.subheader("매수 신호 목록")
+            signal_table = data.loc[data['Buy_Signal'].to_numpy(dtype=bool), ['Close', 'Stop_Loss', 'Take_Profit']]
+            if signal_table.empty:
+                st.info("선택한 기간에 매수 신호가 없습니다.")
+            else:
+                st.dataframe(signal_table)
+else:
+    st.info("사이드바에서 분석할 종목을 입력하거나 검색하세요.")